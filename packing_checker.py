@@ -1,349 +1,568 @@
-import streamlit as st
-import pandas as pd
-import requests
-
-# ---------- STYLING ----------
-st.set_page_config(page_title="Packing Checker Advanced", layout="wide")
-st.markdown("""
-<style>
-body {background-color: #f8fafc;}
-[data-testid="stHeader"] {background-color: #0e1117;}
-h1, h2, h3, h4 {color: #1a237e;}
-.stButton>button {
-    background: #004d40 !important;
-    color: white !important;
-    border-radius: 8px;
-    padding: 0.4em 1.2em;
-    margin: 6px 0;
-    font-weight: 600;
-}
-thead tr th {background: #ede7f6;}
-tbody tr {background: #fafafa;}
-</style>
-""", unsafe_allow_html=True)
-
-def normalize_upc(upc):
-    return str(upc).lstrip('0').strip()
-
-@st.cache_data(show_spinner=False)
-def parse_orders(orders_file):
-    orders = pd.read_csv(orders_file, dtype=str)
-    orders.columns = [c.strip() for c in orders.columns]
-    def colkey(s): return s.strip().replace(" ", "").replace("_", "").upper()
-    upc_col = None
-    for col in orders.columns:
-        if colkey(col) in ["UPCCODE", "UPC"]:
-            upc_col = col
-            break
-    for c in ["TOTAL", "RESERVED", "CONFIRMED", "BALANCE"]:
-        orders[c] = orders[c].astype(int)
-    return orders, upc_col
-
-@st.cache_data(show_spinner=False)
-def parse_boxes(box_file_contents):
-    boxes = {}
-    for filename, content in box_file_contents.items():
-        box_no = filename.replace('BOX NO', '').replace('.TXT','').replace('.txt','').strip()
-        for line in content.strip().splitlines():
-            if ',' in line:
-                code, qty = line.strip().split(',', 1)
-                code_norm = normalize_upc(code)
-                qty = int(qty.strip())
-                if code_norm not in boxes:
-                    boxes[code_norm] = {}
-                boxes[code_norm][box_no] = boxes[code_norm].get(box_no, 0) + qty
-    return boxes
-
-def upload_page():
-    st.title("📦 Order Packing Checker (Step 1: Upload Files)")
-    st.write("""
-    Upload your `orders.csv` (one order line per row), then either:
-    - Paste one or more GitHub "raw" TXT file URLs for your box scans, **OR**
-    - Upload your box scan TXT files directly.
-    """)
-
-    orders_file = st.file_uploader("Upload orders.csv", type=["csv"])
-    box_file_contents = {}
-
-    source = st.radio("How do you want to provide box files?", ["Paste GitHub raw URLs", "Upload TXT files"])
-
-    if source == "Paste GitHub raw URLs":
-        txt_urls = st.text_area("Paste one GitHub raw TXT URL per line (https://raw.githubusercontent.com/...):", height=120)
-        if txt_urls:
-            urls = [u.strip() for u in txt_urls.splitlines() if u.strip()]
-            for url in urls:
-                try:
-                    r = requests.get(url)
-                    if r.status_code == 200:
-                        box_file_contents[url] = r.text
-                        st.success(f"Loaded: {url}")
-                    else:
-                        st.error(f"Failed to fetch {url} (status {r.status_code})")
-                except Exception as e:
-                    st.error(f"Error loading {url}: {e}")
-    else:
-        uploaded_boxes = st.file_uploader("Upload box txt files", type=["txt"], accept_multiple_files=True)
-        for uploaded_file in uploaded_boxes or []:
-            box_file_contents[uploaded_file.name] = uploaded_file.read().decode('utf-8')
-
-    ready = orders_file is not None and len(box_file_contents) > 0
-    if ready:
-        if st.button("Go to Results ➡️"):
-            st.session_state['orders_file'] = orders_file
-            st.session_state['box_file_contents'] = box_file_contents
-            st.session_state['trigger_results'] = True
-
-def main_results_page(orders, upc_col, boxes):
-    st.subheader("Main Allocation Table (Per Order Line)")
-    boxes_remaining = {upc: box_qtys.copy() for upc, box_qtys in boxes.items()}
-    data = []
-    for idx, row in orders.iterrows():
-        order_no = row.get('ORDER NO', '')
-        upc_raw = row[upc_col]
-        code = normalize_upc(upc_raw)
-        style = row.get('STYLE', '')
-        total = row['TOTAL']
-        reserved = row['RESERVED']
-        confirmed = row['CONFIRMED']
-        balance = row['BALANCE']
-        allocation = []
-        qty_needed = reserved
-        scanned_total = 0
-        if code in boxes_remaining:
-            for box_no in sorted(boxes_remaining[code], key=lambda x: int(x) if x.isdigit() else x):
-                box_qty = boxes_remaining[code][box_no]
-                if box_qty > 0 and qty_needed > 0:
-                    allocate_qty = min(qty_needed, box_qty)
-                    allocation.append(f"{box_no}({allocate_qty})")
-                    qty_needed -= allocate_qty
-                    scanned_total += allocate_qty
-                    boxes_remaining[code][box_no] -= allocate_qty
-                if qty_needed == 0:
-                    break
-        missing = ""
-        if scanned_total == reserved and reserved > 0:
-            note = "To invoice"
-        elif scanned_total <= confirmed and confirmed > 0:
-            note = "Already invoiced"
-        elif scanned_total < reserved and reserved > 0:
-            note = f"To unreserve and invoice (missing: {reserved - scanned_total})"
-            missing = str(reserved - scanned_total)
-        elif scanned_total > total:
-            note = "Check: Over-packed"
-        elif scanned_total == 0 and balance > 0:
-            note = f"Not found (missing: {balance})"
-            missing = str(balance)
-        else:
-            note = ""
-        data.append({
-            'ORDER NO': order_no,
-            'UPC CODE': code,
-            'STYLE': style,
-            'TOTAL': total,
-            'RESERVED': reserved,
-            'CONFIRMED': confirmed,
-            'BALANCE': balance,
-            'ALLOCATED QTY': scanned_total,
-            'ALLOCATED BOXES': ", ".join(allocation),
-            'NOTE': note
-        })
-    df = pd.DataFrame(data)
-    st.dataframe(df, use_container_width=True)
-    csv = df.to_csv(index=False).encode()
-    st.download_button("Download results as CSV", data=csv, file_name='check_results.csv', mime='text/csv')
-
-def box_summary_page(orders, upc_col, boxes):
-    st.subheader("Box Summary")
-
-    # Build UPC->STYLE mapping
-    upc_to_style = {}
-    for idx, row in orders.iterrows():
-        upc_to_style[normalize_upc(row[upc_col])] = row.get("STYLE", "")
-
-    all_box_numbers = sorted(
-        set(int(box_no) for upc in boxes for box_no in boxes[upc])
-    )
-
-    box_option = st.radio("Show", ["Single Box", "Multiple Boxes"])
-    if box_option == "Single Box":
-        box_sel = st.selectbox("Select Box Number", all_box_numbers, index=0)
-        box_key = str(box_sel)
-        items = []
-        seq = 1
-        total = 0
-        for upc, box_dict in boxes.items():
-            qty = box_dict.get(box_key, 0)
-            if qty > 0:
-                style = upc_to_style.get(upc, upc)
-                items.append({"Seq No.": seq, "Style Code": style, "Qty": qty})
-                total += qty
-                seq += 1
-        st.markdown(f"**Box No - {box_sel}**")
-        st.markdown(f"**Total items in the box:** {total}")
-        if items:
-            df_items = pd.DataFrame(items)
-            st.table(df_items)
-            csv_items = df_items.to_csv(index=False).encode()
-            st.download_button("Download Box Table as CSV", data=csv_items, file_name=f'box_{box_sel}_items.csv', mime='text/csv')
-        else:
-            st.info("No items in this box.")
-
-    else:  # Multiple Boxes
-        box_multi = st.multiselect("Select Box Numbers", all_box_numbers, default=all_box_numbers)
-        all_items = []
-        total = 0
-        seq = 1
-        for box_sel in box_multi:
-            box_key = str(box_sel)
-            for upc, box_dict in boxes.items():
-                qty = box_dict.get(box_key, 0)
-                if qty > 0:
-                    style = upc_to_style.get(upc, upc)
-                    all_items.append({"Seq No.": seq, "Box No": box_key, "Style Code": style, "Qty": qty})
-                    total += qty
-                    seq += 1
-        st.markdown(f"**Boxes: {', '.join(map(str, box_multi))}**")
-        st.markdown(f"**Total items in selected boxes:** {total}")
-        if all_items:
-            df_items = pd.DataFrame(all_items)
-            st.table(df_items)
-            csv_items = df_items.to_csv(index=False).encode()
-            st.download_button("Download Boxes Table as CSV", data=csv_items, file_name='multi_box_items.csv', mime='text/csv')
-        else:
-            st.info("No items in selected boxes.")
-
-def items_not_on_order_page(orders, upc_col, boxes):
-    st.subheader("Items Scanned But Not On Order (With Box Numbers, By UPC CODE)")
-    ordered_upcs = set(normalize_upc(str(u)) for u in orders[upc_col])
-    scanned_totals = {}
-    scanned_by_box = {}
-    for upc, box_dict in boxes.items():
-        scanned_totals[upc] = sum(box_dict.values())
-        for box_no, qty in box_dict.items():
-            if box_no not in scanned_by_box:
-                scanned_by_box[box_no] = {}
-            scanned_by_box[box_no][upc] = qty
-    not_on_order = []
-    for upc in scanned_totals:
-        if upc not in ordered_upcs:
-            box_breakdown = []
-            for box_no, upc_dict in scanned_by_box.items():
-                if upc in upc_dict:
-                    box_breakdown.append(f"{box_no}({upc_dict[upc]})")
-            not_on_order.append({
-                "UPC CODE": upc,
-                "SCANNED QTY": scanned_totals[upc],
-                "BOX BREAKDOWN": ", ".join(box_breakdown)
-            })
-    if not_on_order:
-        df_not_on_order = pd.DataFrame(not_on_order).sort_values(by="UPC CODE")
-        st.dataframe(df_not_on_order, use_container_width=True)
-        csv_not_on_order = df_not_on_order.to_csv(index=False).encode()
-        st.download_button("Download 'Not On Order' Items CSV", data=csv_not_on_order, file_name='scanned_not_on_order.csv', mime='text/csv')
-    else:
-        st.write("✅ All scanned items are linked to orders.")
-
-def order_status_page(orders, upc_col, boxes):
-    st.subheader("Order Status: Completion and Invoicing Readiness")
-
-    scanned_totals = {}
-    upc_boxes = {}
-    for upc, box_dict in boxes.items():
-        scanned_totals[upc] = sum(box_dict.values())
-        upc_boxes[upc] = [box_no for box_no, qty in box_dict.items() if qty > 0]
-
-    orders_to_check = orders[orders['RESERVED'] > 0]
-    order_numbers = sorted(orders_to_check['ORDER NO'].unique())
-
-    if not order_numbers:
-        st.info("No pending orders with reserved quantities.")
-        return
-
-    order_sel = st.selectbox("Select Order Number", order_numbers)
-    order_rows = orders[orders['ORDER NO'] == order_sel]
-
-    items = []
-    complete = True
-    for idx, row in order_rows.iterrows():
-        upc = normalize_upc(row[upc_col])
-        style = row.get("STYLE", "")
-        needed = row['RESERVED']
-        found = scanned_totals.get(upc, 0)
-        boxes_found = ", ".join(sorted(upc_boxes.get(upc, []), key=lambda x: int(x) if x.isdigit() else x))
-        # Status logic
-        if needed > 0:
-            if found == needed:
-                status = "Ready to Invoice"
-            elif found == 0:
-                status = "Not Found in Box"
-                complete = False
-            elif 0 < found < needed:
-                status = f"Missing: {needed - found}"
-                complete = False
-            elif found > needed:
-                status = f"Over-packed (found: {found}, reserved: {needed})"
-            else:
-                status = ""
-        else:
-            status = "Not Available in Stock"
-            complete = False
-        items.append({
-            "UPC CODE": upc,
-            "Style Code": style,
-            "Qty Needed": needed,
-            "Qty Scanned": found,
-            "Box Numbers": boxes_found,
-            "Status": status
-        })
-
-    st.markdown(f"**Order No - {order_sel}**")
-    st.markdown(f"**Ready for invoicing:** {'COMPLETE' if complete else 'INCOMPLETE'}")
-    df_items = pd.DataFrame(items)
-    st.table(df_items)
-    csv_items = df_items.to_csv(index=False).encode()
-    st.download_button("Download Order Items Table as CSV", data=csv_items, file_name=f'order_{order_sel}_items.csv', mime='text/csv')
-
-def main():
-    if st.session_state.get("back_to_uploads", False):
-        st.session_state.clear()
-        st.session_state["trigger_results"] = False
-        st.session_state["back_to_uploads"] = False
-        st.stop()
-
-    if "trigger_results" not in st.session_state:
-        st.session_state["trigger_results"] = False
-
-    if not st.session_state["trigger_results"]:
-        upload_page()
-    else:
-        orders_file = st.session_state.get('orders_file', None)
-        box_file_contents = st.session_state.get('box_file_contents', {})
-        if not (orders_file and box_file_contents):
-            st.warning("Please upload your files on the first page.")
-            return
-        try:
-            orders, upc_col = parse_orders(orders_file)
-        except pd.errors.EmptyDataError:
-            st.error("Your orders.csv file appears empty or invalid. Please re-upload.")
-            st.session_state["back_to_uploads"] = True
-            st.stop()
-        boxes = parse_boxes(box_file_contents)
-        st.markdown("## 📊 Reports & Summaries")
-        tab1, tab2, tab3, tab4 = st.tabs(
-            ["Main Allocation Table", "Box Summary", "Items Not On Order", "Order Status"]
-        )
-        with tab1:
-            main_results_page(orders, upc_col, boxes)
-        with tab2:
-            box_summary_page(orders, upc_col, boxes)
-        with tab3:
-            items_not_on_order_page(orders, upc_col, boxes)
-        with tab4:
-            order_status_page(orders, upc_col, boxes)
-            
-        if st.button("⬅️ Back to Uploads"):
-            st.session_state.clear()
-            st.stop()
-
-if __name__ == "__main__":
-    main()
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import streamlit as st
+import pandas as pd
+import requests
+
+# On-disk cache of parsed inputs, keyed by content hash. Survives app
+# restarts, unlike st.cache_data. Writes are best-effort and skipped for
+# oversized inputs.
+DISK_CACHE_DIR = Path.home() / ".streamlit" / "cache" / "packing_checker"
+DISK_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+def _disk_cache_path(raw_bytes, suffix):
+    return DISK_CACHE_DIR / (hashlib.sha1(raw_bytes).hexdigest() + suffix)
+
+def _disk_cache_read(path):
+    # Catch everything: a truncated parquet file raises ArrowInvalid, not
+    # OSError, and the content-hashed path means a bad file would otherwise
+    # crash the same upload on every run.
+    try:
+        if path.exists():
+            return pd.read_parquet(path)
+    except Exception:
+        pass
+    return None
+
+def _disk_cache_write(path, df, raw_size):
+    if raw_size > DISK_CACHE_MAX_BYTES:
+        return
+    # Write to a temp file and rename so a death mid-write never leaves a
+    # truncated parquet at the final path.
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    try:
+        DISK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(tmp)
+        tmp.replace(path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+# ---------- STYLING ----------
+st.set_page_config(page_title="Packing Checker Advanced", layout="wide")
+st.markdown("""
+<style>
+body {background-color: #f8fafc;}
+[data-testid="stHeader"] {background-color: #0e1117;}
+h1, h2, h3, h4 {color: #1a237e;}
+.stButton>button {
+    background: #004d40 !important;
+    color: white !important;
+    border-radius: 8px;
+    padding: 0.4em 1.2em;
+    margin: 6px 0;
+    font-weight: 600;
+}
+thead tr th {background: #ede7f6;}
+tbody tr {background: #fafafa;}
+</style>
+""", unsafe_allow_html=True)
+
+def _sort_by_box_no(boxes_df):
+    """Order box rows by UPC then numeric box number, computed once at parse time.
+
+    Non-numeric box numbers (e.g. URL-derived names) sort last, alphabetically.
+    Downstream code relies on this ordering instead of re-sorting with a
+    per-element key function.
+    """
+    boxes_df['BOX_NO_SORT'] = pd.to_numeric(boxes_df['BOX_NO'], errors='coerce')
+    return boxes_df.sort_values(['UPC', 'BOX_NO_SORT', 'BOX_NO'],
+                                na_position='last', ignore_index=True)
+
+@st.cache_data(show_spinner=False)
+def parse_orders(orders_file):
+    raw = orders_file.getvalue()
+    cache_path = _disk_cache_path(raw, '.orders.parquet')
+    orders = _disk_cache_read(cache_path)
+    if orders is None:
+        # Header-only read to learn the column names, then parse the numeric
+        # columns as int64 in the same pass instead of astype()-ing afterwards
+        preview = pd.read_csv(io.BytesIO(raw), nrows=0)
+        numeric_cols = {"TOTAL", "RESERVED", "CONFIRMED", "BALANCE"}
+        dtypes = {c: ('int64' if c.strip() in numeric_cols else str)
+                  for c in preview.columns}
+        try:
+            # The pyarrow engine parses the CSV multi-threaded
+            orders = pd.read_csv(io.BytesIO(raw), dtype=dtypes, engine='pyarrow')
+        except (ImportError, ValueError):
+            orders = pd.read_csv(io.BytesIO(raw), dtype=dtypes)
+        orders.columns = [c.strip() for c in orders.columns]
+        _disk_cache_write(cache_path, orders, len(raw))
+    def colkey(s): return s.strip().replace(" ", "").replace("_", "").upper()
+    upc_col = None
+    for col in orders.columns:
+        if colkey(col) in ["UPCCODE", "UPC"]:
+            upc_col = col
+            break
+    # Normalize all UPCs in one vectorized pass instead of per-row calls later
+    orders['UPC_CODE_NORM'] = orders[upc_col].astype(str).str.lstrip('0').str.strip()
+    # STYLE is optional in the input; materialize it once so downstream
+    # column access never has to guard for it
+    if 'STYLE' not in orders.columns:
+        orders['STYLE'] = ''
+    return orders, upc_col
+
+def _box_files_digest(box_files):
+    """Content hash of (filename, content) pairs, computed once per upload."""
+    h = hashlib.sha1()
+    for name, content in box_files:
+        h.update(name.encode())
+        h.update(b"\1")
+        h.update(content.encode() if isinstance(content, str) else content)
+        h.update(b"\0")
+    return h.hexdigest()
+
+@st.cache_data(show_spinner=False)
+def parse_boxes(content_key, _box_files):
+    """Parse box scan files into a tidy DataFrame with columns UPC, BOX_NO, QTY.
+
+    _box_files is a tuple of (filename, content) pairs. The leading
+    underscore tells Streamlit not to hash the contents on every rerun;
+    content_key (from _box_files_digest) stands in as the cache key.
+    """
+    cache_path = DISK_CACHE_DIR / (content_key + '.boxes.parquet')
+    cached = _disk_cache_read(cache_path)
+    if cached is not None:
+        return cached
+    frames = []
+    for filename, content in _box_files:
+        box_no = filename.replace('BOX NO', '').replace('.TXT','').replace('.txt','').strip()
+        if isinstance(content, str):
+            content = content.encode()
+        if not content.strip():
+            continue
+        # The C tokenizer is an order of magnitude faster than splitting
+        # lines in Python; QTY parses as numeric in the same pass
+        try:
+            df = pd.read_csv(io.BytesIO(content), header=None, names=['UPC', 'QTY'],
+                             dtype={'UPC': str}, usecols=[0, 1])
+        except pd.errors.ParserError:
+            # A file with no commas at all has a single column and trips the
+            # usecols check; the old per-line comma test skipped such lines
+            continue
+        df = df.dropna(subset=['QTY'])
+        df['BOX_NO'] = box_no
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame({'UPC': pd.Series(dtype=str),
+                             'BOX_NO': pd.Series(dtype=str),
+                             'QTY': pd.Series(dtype='int64')})
+    boxes_df = pd.concat(frames, ignore_index=True)
+    # Strip whitespace before leading zeros: the old tokenizer stripped each
+    # line first, so " 0456 " must normalize to "456", not "0456"
+    boxes_df['UPC'] = boxes_df['UPC'].str.strip().str.lstrip('0')
+    boxes_df['QTY'] = boxes_df['QTY'].astype('int64')
+    boxes_df = boxes_df.groupby(['UPC', 'BOX_NO'], as_index=False)['QTY'].sum()
+    boxes_df = _sort_by_box_no(boxes_df)
+    raw_size = sum(len(content) for _, content in _box_files)
+    _disk_cache_write(cache_path, boxes_df, raw_size)
+    return boxes_df
+
+@st.cache_data(show_spinner=False)
+def build_scanned_index(boxes_df):
+    """Per-UPC scanned totals and box lists, shared by the report tabs."""
+    scanned_totals = boxes_df.groupby('UPC')['QTY'].sum()
+    upc_boxes = boxes_df[boxes_df['QTY'] > 0].groupby('UPC')['BOX_NO'].agg(list)
+    return scanned_totals, upc_boxes
+
+@st.cache_data(show_spinner=False)
+def build_upc_to_style(orders):
+    """UPC -> STYLE mapping as a Series, cached so tab switches don't rebuild it."""
+    styles = orders['STYLE'] if 'STYLE' in orders.columns else pd.Series("", index=orders.index)
+    upc_to_style = pd.Series(styles.to_numpy(), index=orders['UPC_CODE_NORM'].to_numpy())
+    # Keep the last occurrence per UPC, as successive dict writes used to
+    return upc_to_style[~upc_to_style.index.duplicated(keep='last')]
+
+PREVIEW_ROWS = 1000
+
+def show_dataframe(df):
+    """Render at most PREVIEW_ROWS rows; full frames still go to the download button.
+
+    Streamlit serializes whatever it renders to Arrow on every rerun, so
+    capping the on-screen slice keeps large tables responsive.
+    """
+    if len(df) > PREVIEW_ROWS:
+        st.dataframe(df.head(PREVIEW_ROWS), use_container_width=True)
+        st.caption(f"Showing first {PREVIEW_ROWS} of {len(df)} rows — download the CSV for the full table.")
+    else:
+        st.dataframe(df, use_container_width=True)
+
+@st.cache_data(show_spinner=False)
+def df_to_csv_bytes(df):
+    """Serialize a DataFrame straight to UTF-8 bytes for download buttons.
+
+    Writing into a BytesIO skips the intermediate Python str that
+    .to_csv(...).encode() would allocate, and the cache keeps reruns from
+    re-serializing an unchanged table.
+    """
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding='utf-8', lineterminator='\n')
+    return buf.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def http_session():
+    """Shared pooled HTTP session, reused across reruns and sessions."""
+    session = requests.Session()
+    # Size the connection pool to the fetch worker cap so no thread waits
+    # for a free connection
+    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def fetch_urls(urls):
+    """Fetch TXT URLs in parallel over the shared pooled session.
+
+    Returns (url, content-bytes, error) tuples in input order; error is None
+    on success. The body is kept as raw bytes — parse_boxes consumes bytes
+    directly, so decoding to str would only double the memory. Streamlit
+    calls happen in the caller, not here — st writes are not thread-safe.
+    """
+    if not urls:
+        return []
+    session = http_session()
+
+    def fetch(url):
+        try:
+            r = session.get(url, timeout=30)
+            if r.status_code == 200:
+                return url, r.content, None
+            return url, None, f"Failed to fetch {url} (status {r.status_code})"
+        except Exception as e:
+            return url, None, f"Error loading {url}: {e}"
+
+    with ThreadPoolExecutor(max_workers=min(16, len(urls))) as pool:
+        return list(pool.map(fetch, urls))
+
+def upload_page():
+    st.title("📦 Order Packing Checker (Step 1: Upload Files)")
+    st.write("""
+    Upload your `orders.csv` (one order line per row), then either:
+    - Paste one or more GitHub "raw" TXT file URLs for your box scans, **OR**
+    - Upload your box scan TXT files directly.
+    """)
+
+    orders_file = st.file_uploader("Upload orders.csv", type=["csv"])
+    box_file_contents = {}
+
+    source = st.radio("How do you want to provide box files?", ["Paste GitHub raw URLs", "Upload TXT files"])
+
+    if source == "Paste GitHub raw URLs":
+        txt_urls = st.text_area("Paste one GitHub raw TXT URL per line (https://raw.githubusercontent.com/...):", height=120)
+        if txt_urls:
+            urls = [u.strip() for u in txt_urls.splitlines() if u.strip()]
+            for url, content, error in fetch_urls(urls):
+                if error is None:
+                    box_file_contents[url] = content
+                    st.success(f"Loaded: {url}")
+                else:
+                    st.error(error)
+    else:
+        uploaded_boxes = st.file_uploader("Upload box txt files", type=["txt"], accept_multiple_files=True)
+        for uploaded_file in uploaded_boxes or []:
+            # Keep raw bytes; parse_boxes feeds them to the parser undecoded
+            box_file_contents[uploaded_file.name] = uploaded_file.getvalue()
+
+    ready = orders_file is not None and len(box_file_contents) > 0
+    if ready:
+        if st.button("Go to Results ➡️"):
+            # Sorted tuple of pairs: hashable for st.cache_data and stable
+            # across reruns regardless of upload order
+            box_files = tuple(sorted(box_file_contents.items()))
+            st.session_state['uploads'] = {
+                'orders_file': orders_file,
+                'box_files': box_files,
+                'box_key': _box_files_digest(box_files),
+            }
+            st.rerun()
+
+def compute_notes(df):
+    """NOTE column for the allocation table, evaluated branchlessly with np.select."""
+    allocated = df['ALLOCATED QTY']
+    reserved = df['RESERVED']
+    confirmed = df['CONFIRMED']
+    conditions = [
+        (allocated == reserved) & (reserved > 0),
+        (allocated <= confirmed) & (confirmed > 0),
+        (allocated < reserved) & (reserved > 0),
+        allocated > df['TOTAL'],
+        (allocated == 0) & (df['BALANCE'] > 0),
+    ]
+    choices = [
+        'To invoice',
+        'Already invoiced',
+        'To unreserve and invoice (missing: ' + (reserved - allocated).astype(str) + ')',
+        'Check: Over-packed',
+        'Not found (missing: ' + df['BALANCE'].astype(str) + ')',
+    ]
+    return np.select(conditions, choices, default='')
+
+@st.cache_data(show_spinner=False)
+def allocate_orders(orders, boxes_df):
+    """Allocate each order line against scanned box stock, in box number order.
+
+    Order lines sharing a UPC draw from the same pool in row order, so the
+    i-th line for a UPC owns the interval [start, end) of that UPC's
+    cumulative reserved demand. Mapping those intervals onto the prefix sums
+    of the presorted box quantities yields every per-box allocation without
+    mutating any remaining-stock state row by row.
+
+    Returns the per-order-line allocation table shown on the main results page.
+    """
+    reserved = orders['RESERVED'].to_numpy()
+    codes = orders['UPC_CODE_NORM'].to_numpy()
+
+    # Work on int codes instead of UPC strings: factorize the order UPCs and
+    # align the box rows onto the same codes (boxes for unordered UPCs get -1)
+    code_ids, upc_index = pd.factorize(orders['UPC_CODE_NORM'])
+    box_ids = pd.Index(upc_index).get_indexer(boxes_df['UPC'])
+    matched = box_ids >= 0
+
+    # Per-code box names and capacity prefix sums; boxes_df is presorted
+    box_names = [None] * len(upc_index)
+    box_cum = [None] * len(upc_index)
+    box_qty = boxes_df['QTY'].to_numpy()
+    for cid, grp in boxes_df[matched].groupby(box_ids[matched], sort=False):
+        box_names[cid] = np.asarray(grp['BOX_NO'], dtype=object)
+        box_cum[cid] = grp['QTY'].to_numpy().cumsum()
+    cap_per_code = np.bincount(box_ids[matched], weights=box_qty[matched],
+                               minlength=len(upc_index)).astype(np.int64)
+    capacity = cap_per_code[code_ids]
+
+    # Cumsum the clamped demand: a negative RESERVED line allocates 0 but
+    # must not hand its stock back to later lines of the same UPC, which is
+    # what the greedy loop did. Raw `reserved` still feeds the output columns.
+    demand = np.maximum(reserved, 0)
+    demand_end = pd.Series(demand).groupby(code_ids).cumsum().to_numpy()
+    start = np.clip(demand_end - demand, 0, capacity)
+    end = np.clip(demand_end, 0, capacity)
+    allocated = np.maximum(end - start, 0)
+
+    # Box breakdown strings, assembled in bulk: per UPC, searchsorted gives
+    # the box range each demand interval spans; expanding those ranges into
+    # (order line, box) pairs lets one grouped join emit every string
+    alloc_strings = np.full(len(orders), '', dtype=object)
+    active = pd.DataFrame({'code': code_ids, 'start': start, 'end': end})[allocated > 0]
+    piece_rows, piece_strs = [], []
+    for cid, grp in active.groupby('code', sort=False):
+        cum = box_cum[cid]
+        names = box_names[cid]
+        s = grp['start'].to_numpy()
+        e = grp['end'].to_numpy()
+        first = np.searchsorted(cum, s, side='right')
+        last = np.searchsorted(cum, e, side='left')
+        reps = last - first + 1
+        total = int(reps.sum())
+        j = np.repeat(first, reps) + np.arange(total) - np.repeat(np.cumsum(reps) - reps, reps)
+        rows = np.repeat(grp.index.to_numpy(), reps)
+        lower = np.maximum(np.where(j > 0, cum[j - 1], 0), np.repeat(s, reps))
+        take = np.minimum(cum[j], np.repeat(e, reps)) - lower
+        keep = take > 0
+        piece_rows.append(rows[keep])
+        piece_strs.append(names[j[keep]] + '(' + take[keep].astype(str).astype(object) + ')')
+    if piece_rows:
+        joined = (pd.Series(np.concatenate(piece_strs))
+                  .groupby(np.concatenate(piece_rows)).agg(', '.join))
+        alloc_strings[joined.index.to_numpy()] = joined.to_numpy()
+
+    df = pd.DataFrame({
+        'ORDER NO': orders['ORDER NO'].to_numpy(),
+        'UPC CODE': codes,
+        'STYLE': orders['STYLE'].to_numpy(),
+        'TOTAL': orders['TOTAL'].to_numpy(),
+        'RESERVED': reserved,
+        'CONFIRMED': orders['CONFIRMED'].to_numpy(),
+        'BALANCE': orders['BALANCE'].to_numpy(),
+        'ALLOCATED QTY': allocated,
+        'ALLOCATED BOXES': alloc_strings,
+    })
+    df['NOTE'] = compute_notes(df)
+    return df
+
+def main_results_page(orders, upc_col, boxes_df):
+    st.subheader("Main Allocation Table (Per Order Line)")
+    df = allocate_orders(orders, boxes_df)
+    show_dataframe(df)
+    csv = df_to_csv_bytes(df)
+    st.download_button("Download results as CSV", data=csv, file_name='check_results.csv', mime='text/csv')
+
+def box_summary_page(orders, upc_col, boxes_df):
+    st.subheader("Box Summary")
+
+    upc_to_style = build_upc_to_style(orders)
+
+    all_box_numbers = sorted(boxes_df['BOX_NO'].astype(int).unique())
+
+    def items_table(selected, with_box_no=False):
+        selected = selected[selected['QTY'] > 0].copy()
+        # m:1 asserts one style row per UPC, letting the join take its fast path
+        selected = selected.merge(upc_to_style.rename('Style Code'),
+                                  left_on='UPC', right_index=True,
+                                  how='left', validate='m:1')
+        selected['Style Code'] = selected['Style Code'].fillna(selected['UPC'])
+        selected = selected.rename(columns={'QTY': 'Qty', 'BOX_NO': 'Box No'})
+        cols = ['Box No', 'Style Code', 'Qty'] if with_box_no else ['Style Code', 'Qty']
+        selected = selected[cols]
+        selected.insert(0, 'Seq No.', range(1, len(selected) + 1))
+        return selected
+
+    box_option = st.radio("Show", ["Single Box", "Multiple Boxes", "All Boxes Overview"])
+    if box_option == "All Boxes Overview":
+        # One pivot_table call produces the whole Box x Style quantity grid
+        long = boxes_df[boxes_df['QTY'] > 0].copy()
+        long['Style'] = long['UPC'].map(upc_to_style).fillna(long['UPC'])
+        overview = long.pivot_table(index='BOX_NO', columns='Style',
+                                    values='QTY', aggfunc='sum', fill_value=0)
+        overview.insert(0, 'TOTAL ITEMS', overview.sum(axis=1))
+        overview = overview.iloc[np.argsort(pd.to_numeric(overview.index, errors='coerce'))]
+        overview = overview.reset_index().rename(columns={'BOX_NO': 'Box No'})
+        st.markdown("**Total scanned per box, by style**")
+        show_dataframe(overview)
+        csv_items = df_to_csv_bytes(overview)
+        st.download_button("Download Overview as CSV", data=csv_items, file_name='box_style_overview.csv', mime='text/csv')
+        return
+    if box_option == "Single Box":
+        box_sel = st.selectbox("Select Box Number", all_box_numbers, index=0)
+        box_key = str(box_sel)
+        df_items = items_table(boxes_df[boxes_df['BOX_NO'] == box_key])
+        st.markdown(f"**Box No - {box_sel}**")
+        st.markdown(f"**Total items in the box:** {df_items['Qty'].sum()}")
+        if not df_items.empty:
+            st.table(df_items)
+            csv_items = df_to_csv_bytes(df_items)
+            st.download_button("Download Box Table as CSV", data=csv_items, file_name=f'box_{box_sel}_items.csv', mime='text/csv')
+        else:
+            st.info("No items in this box.")
+
+    else:  # Multiple Boxes
+        box_multi = st.multiselect("Select Box Numbers", all_box_numbers, default=all_box_numbers)
+        box_keys = [str(b) for b in box_multi]
+        selected = boxes_df[boxes_df['BOX_NO'].isin(box_keys)].copy()
+        # Keep rows in the order the boxes were selected
+        selected['BOX_NO'] = pd.Categorical(selected['BOX_NO'], categories=box_keys, ordered=True)
+        df_items = items_table(selected.sort_values('BOX_NO', kind='stable'), with_box_no=True)
+        st.markdown(f"**Boxes: {', '.join(map(str, box_multi))}**")
+        st.markdown(f"**Total items in selected boxes:** {df_items['Qty'].sum()}")
+        if not df_items.empty:
+            st.table(df_items)
+            csv_items = df_to_csv_bytes(df_items)
+            st.download_button("Download Boxes Table as CSV", data=csv_items, file_name='multi_box_items.csv', mime='text/csv')
+        else:
+            st.info("No items in selected boxes.")
+
+def items_not_on_order_page(orders, upc_col, boxes_df):
+    st.subheader("Items Scanned But Not On Order (With Box Numbers, By UPC CODE)")
+    scanned = build_scanned_index(boxes_df)[0].reset_index()
+    merged = scanned.merge(
+        orders[['UPC_CODE_NORM']].drop_duplicates(),
+        left_on='UPC', right_on='UPC_CODE_NORM',
+        how='left', indicator=True, validate='m:1')
+    not_on_order = merged.loc[merged['_merge'] == 'left_only', ['UPC', 'QTY']]
+    if not not_on_order.empty:
+        # boxes_df is presorted, so the breakdown comes out in box order
+        extra = boxes_df[boxes_df['UPC'].isin(not_on_order['UPC'])].copy()
+        extra['ENTRY'] = extra['BOX_NO'] + '(' + extra['QTY'].astype(str) + ')'
+        breakdown = extra.groupby('UPC')['ENTRY'].agg(', '.join)
+        df_not_on_order = not_on_order.rename(
+            columns={'UPC': 'UPC CODE', 'QTY': 'SCANNED QTY'})
+        df_not_on_order['BOX BREAKDOWN'] = df_not_on_order['UPC CODE'].map(breakdown)
+        df_not_on_order = df_not_on_order.sort_values(by="UPC CODE")
+        show_dataframe(df_not_on_order)
+        csv_not_on_order = df_to_csv_bytes(df_not_on_order)
+        st.download_button("Download 'Not On Order' Items CSV", data=csv_not_on_order, file_name='scanned_not_on_order.csv', mime='text/csv')
+    else:
+        st.write("✅ All scanned items are linked to orders.")
+
+def order_status_page(orders, upc_col, boxes_df):
+    st.subheader("Order Status: Completion and Invoicing Readiness")
+
+    scanned_totals, upc_boxes = build_scanned_index(boxes_df)
+
+    orders_to_check = orders[orders['RESERVED'] > 0]
+    order_numbers = sorted(orders_to_check['ORDER NO'].unique())
+
+    if not order_numbers:
+        st.info("No pending orders with reserved quantities.")
+        return
+
+    order_sel = st.selectbox("Select Order Number", order_numbers)
+    order_rows = orders[orders['ORDER NO'] == order_sel]
+
+    merged = order_rows.merge(scanned_totals.rename('FOUND'),
+                              left_on='UPC_CODE_NORM', right_index=True,
+                              how='left', validate='m:1')
+    needed = merged['RESERVED']
+    found = merged['FOUND'].fillna(0).astype('int64')
+    conditions = [
+        (needed > 0) & (found == needed),
+        (needed > 0) & (found == 0),
+        (needed > 0) & (found < needed),
+        (needed > 0) & (found > needed),
+    ]
+    choices = [
+        'Ready to Invoice',
+        'Not Found in Box',
+        'Missing: ' + (needed - found).astype(str),
+        'Over-packed (found: ' + found.astype(str) + ', reserved: ' + needed.astype(str) + ')',
+    ]
+    status = np.select(conditions, choices, default='Not Available in Stock')
+    # An order is complete when every line with stock is fully scanned;
+    # over-packed lines never blocked invoicing before and still don't
+    complete = bool(((needed > 0) & (found >= needed)).all())
+
+    st.markdown(f"**Order No - {order_sel}**")
+    st.markdown(f"**Ready for invoicing:** {'COMPLETE' if complete else 'INCOMPLETE'}")
+    df_items = pd.DataFrame({
+        "UPC CODE": merged['UPC_CODE_NORM'].to_numpy(),
+        "Style Code": merged['STYLE'].to_numpy(),
+        "Qty Needed": needed.to_numpy(),
+        "Qty Scanned": found.to_numpy(),
+        "Box Numbers": merged['UPC_CODE_NORM'].map(upc_boxes.str.join(', ')).fillna('').to_numpy(),
+        "Status": status,
+    })
+    st.table(df_items)
+    csv_items = df_to_csv_bytes(df_items)
+    st.download_button("Download Order Items Table as CSV", data=csv_items, file_name=f'order_{order_sel}_items.csv', mime='text/csv')
+
+def main():
+    # All upload-side state lives in one dict so a single key decides which
+    # page renders and one pop() is enough to reset the app.
+    uploads = st.session_state.get('uploads')
+    if uploads is None:
+        upload_page()
+        return
+
+    orders_file = uploads['orders_file']
+    box_file_contents = uploads['box_files']
+    if not (orders_file and box_file_contents):
+        st.warning("Please upload your files on the first page.")
+        return
+    try:
+        orders, upc_col = parse_orders(orders_file)
+    except pd.errors.EmptyDataError:
+        st.error("Your orders.csv file appears empty or invalid. Please re-upload.")
+        st.session_state.pop('uploads', None)
+        st.stop()
+    boxes_df = parse_boxes(uploads['box_key'], box_file_contents)
+    st.markdown("## 📊 Reports & Summaries")
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Main Allocation Table", "Box Summary", "Items Not On Order", "Order Status"]
+    )
+    with tab1:
+        main_results_page(orders, upc_col, boxes_df)
+    with tab2:
+        box_summary_page(orders, upc_col, boxes_df)
+    with tab3:
+        items_not_on_order_page(orders, upc_col, boxes_df)
+    with tab4:
+        order_status_page(orders, upc_col, boxes_df)
+
+    if st.button("⬅️ Back to Uploads"):
+        st.session_state.clear()
+        st.rerun()
+
+if __name__ == "__main__":
+    main()